@@ -0,0 +1,25 @@
+import os
+import tempfile
+from typing import Callable, IO
+
+
+def write_atomic(path: str, write: Callable[[IO], None], binary: bool = False) -> None:
+    """
+    Call write with a temporary file next to path, then move it into place, so
+    path is either left untouched or holds the complete output
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates files readable by the owner only, use the usual permissions instead
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,253 @@
+from math import tau
+from typing import List, Optional, Tuple
+
+import numpy as np
+from datatypes.geometry import Point2D
+
+from circuit_generator.circuit import Circuit
+from circuit_generator.generator import CircuitGenerator
+from circuit_generator.sections import Straight, BezierTurn
+
+
+class CircuitBatch:
+    """
+    Structure-of-arrays batch of circuits padded to the longest one. Section j
+    of circuit i exists where mask[i, j]; sections without control points are
+    straights and the rest are Bézier turns.
+    """
+    def __init__(self, start: np.ndarray, end: np.ndarray, control_points: np.ndarray,
+                 n_control_points: np.ndarray, mask: np.ndarray):
+        # (N, S, 2)
+        self.start, self.end = start, end
+        # (N, S, 2, 2), only the first n_control_points[i, j] are meaningful
+        self.control_points = control_points
+        # (N, S)
+        self.n_control_points = n_control_points
+        self.mask = mask
+
+    def lengths(self) -> np.ndarray:
+        return self.mask.sum(axis=1)
+
+    def __len__(self):
+        return self.start.shape[0]
+
+    def __getitem__(self, item) -> Circuit:
+        sections = []
+        for j in np.flatnonzero(self.mask[item]):
+            start, end = Point2D(*self.start[item, j].tolist()), Point2D(*self.end[item, j].tolist())
+            n_control_points = self.n_control_points[item, j]
+            if n_control_points == 0:
+                sections.append(Straight(start, end))
+            else:
+                sections.append(BezierTurn(
+                    start,
+                    [Point2D(*p) for p in self.control_points[item, j, :n_control_points].tolist()],
+                    end
+                ))
+        return Circuit.from_objects(sections)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def to_circuits(self) -> List[Circuit]:
+        return list(self)
+
+
+def _cyclic_indices(counts: np.ndarray, width: int, shift: int) -> np.ndarray:
+    """
+    Index of the element shift positions away in each row, wrapping at the row's count
+    """
+    return (np.arange(width) + shift) % np.maximum(counts, 1)[:, None]
+
+
+def _gather(array: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    return array[np.arange(array.shape[0])[:, None], indices]
+
+
+def _compact(mask: np.ndarray, *arrays: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Move the entries of every row where mask is set to the front, keeping their order
+    """
+    order = np.argsort(~mask, axis=1, kind='stable')
+    return tuple(_gather(a, order) for a in (mask, *arrays))
+
+
+def _displace(points: np.ndarray, max_radius: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    radius = max_radius * rng.random(max_radius.shape)
+    angle = rng.uniform(0, tau, max_radius.shape)
+    return points + np.stack([radius * np.cos(angle), radius * np.sin(angle)], axis=-1)
+
+
+class BatchCircuitGenerator(CircuitGenerator):
+    """
+    Runs the CircuitGenerator pipeline for many circuits in lockstep on padded
+    NumPy arrays. The rules are the same as in generate_layout, but numbers come
+    from a NumPy random stream, so layouts differ from generate_layout's for
+    the same seed.
+    """
+    def generate_batch(self, n: int, seed: Optional[int] = None) -> CircuitBatch:
+        rng = np.random.default_rng(seed)
+        points, counts = self._generate_batch_points(n, rng)
+        is_straight = self._detect_batch_straights(points, counts, rng)
+        is_straight = self._avoid_too_many_consecutive_batch_turns(is_straight, counts)
+        sections = self._create_batch_sections(points, counts, is_straight, rng)
+        return self._correct_batch_flow(*sections, rng)
+
+    def _generate_batch_points(self, n: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        if self.POINTS_MAX < 3:
+            raise ValueError('Circuits need at least 3 points, n_points maximum is too small.')
+        points = np.zeros((n, self.POINTS_MAX, 2))
+        counts = np.zeros(n, dtype=int)
+        pending = np.arange(n)
+        # Small angle correction may leave too few points, those rows are drawn again
+        while pending.size:
+            new_points, new_counts = self._random_batch_points(pending.size, rng)
+            new_points = self._order_batch_points_by_angle(new_points, new_counts)
+            new_points, new_counts = self._correct_very_small_batch_angles(new_points, new_counts)
+            ok = new_counts >= 3
+            points[pending[ok]], counts[pending[ok]] = new_points[ok], new_counts[ok]
+            pending = pending[~ok]
+        return points, counts
+
+    def _random_batch_points(self, n: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        counts = rng.integers(self.POINTS_MIN, self.POINTS_MAX, n, endpoint=True)
+        points = np.stack([rng.integers(self.X_MIN, self.X_MAX, (n, self.POINTS_MAX), endpoint=True),
+                           rng.integers(self.Y_MIN, self.Y_MAX, (n, self.POINTS_MAX), endpoint=True)],
+                          axis=-1).astype(float)
+        return points, counts
+
+    @staticmethod
+    def _order_batch_points_by_angle(points: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        valid = np.arange(points.shape[1]) < counts[:, None]
+        angles = np.where(valid, np.arctan2(points[..., 1], points[..., 0]), np.inf)
+        return _gather(points, np.argsort(angles, axis=1, kind='stable'))
+
+    def _correct_very_small_batch_angles(self, points: np.ndarray, counts: np.ndarray) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        n, width = points.shape[:2]
+        index = np.arange(width)
+        valid = index < counts[:, None]
+        v1 = _gather(points, _cyclic_indices(counts, width, -1)) - points
+        v2 = _gather(points, _cyclic_indices(counts, width, 1)) - points
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cosine = np.sum(v1 * v2, axis=-1) / (np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1))
+        # Repeated points have no angle, treat them as small ones
+        angle = np.arccos(np.clip(np.nan_to_num(cosine, nan=1.), -1, 1))
+        large = valid & (angle > self.SMALL_ANGLE_THRESHOLD)
+
+        # Every large angle closes a sequence of small ones started after the previous large angle
+        last_large = np.maximum.accumulate(np.where(large, index, -1), axis=1)
+        previous_large = np.concatenate([np.full((n, 1), -1), last_large[:, :-1]], axis=1)
+        # Same net effect as correct_small_angle_sequence's repeated swapping of the first two points
+        rows, columns = np.nonzero(large & ((index - previous_large) // 2 % 2 == 1))
+        first = previous_large[rows, columns] + 1
+        points = points.copy()
+        points[rows, first], points[rows, first + 1] = points[rows, first + 1], points[rows, first]
+        # Points after the last large angle are dropped, as in CircuitGenerator
+        return points, last_large[:, -1] + 1
+
+    def _detect_batch_straights(self, points: np.ndarray, counts: np.ndarray, rng: np.random.Generator) \
+            -> np.ndarray:
+        valid = np.arange(points.shape[1]) < counts[:, None]
+        distance = np.linalg.norm(_gather(points, _cyclic_indices(counts, points.shape[1], 1)) - points, axis=-1)
+        return valid & ((distance > self.LONG_STRAIGHT_THRESHOLD)
+                        | (distance > self.SHORT_STRAIGHT_THRESHOLD)
+                        & (rng.random(distance.shape) < self.SS_PROBABILITY)
+                        | (distance < self.CHICANE_THRESHOLD))
+
+    def _avoid_too_many_consecutive_batch_turns(self, is_straight: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        index = np.arange(is_straight.shape[1])
+        valid = index < counts[:, None]
+        # Rows made only of turns form a single cyclic run, starting it with a straight
+        # lets the closed form below count it like any other
+        is_straight = is_straight.copy()
+        is_straight[~is_straight.any(axis=1), 0] = True
+        last_straight = np.maximum.accumulate(np.where(is_straight, index, -1), axis=1)
+        # Turns before the first straight continue the run that wraps around from the last one
+        wrapped = last_straight[:, -1:] - counts[:, None]
+        run_position = index - np.where(last_straight >= 0, last_straight, wrapped)
+        return is_straight | valid & (run_position % (self.MAX_CONSECUTIVE_TURNS + 1) == 0)
+
+    def _create_batch_sections(self, points: np.ndarray, counts: np.ndarray, is_straight: np.ndarray,
+                               rng: np.random.Generator) -> Tuple[np.ndarray, ...]:
+        """
+        Lay out two slots per point: the turn created after a straight ending on
+        it, if any, followed by the straight or turn starting from it
+        """
+        n, width = is_straight.shape
+        valid = np.arange(width) < counts[:, None]
+        previous, following = _cyclic_indices(counts, width, -1), _cyclic_indices(counts, width, 1)
+        after_straight = valid & _gather(is_straight, previous)
+
+        next_points = _gather(points, following)
+        turn_end = points + rng.uniform(self.SER_MIN, self.SER_MAX, (n, width, 1)) * (next_points - points)
+        start = np.where(after_straight[..., None], turn_end, points)
+        previous_start = _gather(start, previous)
+        turn_start = previous_start \
+            + rng.uniform(self.SSR_MIN, self.SSR_MAX, (n, width, 1)) * (points - previous_start)
+        end = np.where(is_straight[..., None], _gather(turn_start, following), _gather(start, following))
+
+        cubic = rng.random((n, width)) < self.CUBIC_TURN_PROBABILITY
+        direction = end - start
+        max_radius = np.linalg.norm(direction, axis=-1)[..., None] \
+            * rng.uniform(self.TDR_MIN, self.TDR_MAX, (n, width, 2))
+        control_points = _displace(
+            np.stack([start + np.where(cubic[..., None], 1 / 3, 1 / 2) * direction, start + 2 / 3 * direction],
+                     axis=2),
+            max_radius, rng
+        )
+        n_control_points = np.where(is_straight, 0, np.where(cubic, 2, 1))
+
+        corner_control_points = np.stack([points, np.zeros_like(points)], axis=2)
+        return _compact(
+            np.stack([after_straight, valid], axis=2).reshape(n, 2 * width),
+            np.stack([turn_start, start], axis=2).reshape(n, 2 * width, 2),
+            np.stack([start, end], axis=2).reshape(n, 2 * width, 2),
+            np.stack([corner_control_points, control_points], axis=2).reshape(n, 2 * width, 2, 2),
+            np.stack([np.ones_like(n_control_points), n_control_points], axis=2).reshape(n, 2 * width)
+        )
+
+    def _correct_batch_flow(self, mask: np.ndarray, start: np.ndarray, end: np.ndarray,
+                            control_points: np.ndarray, n_control_points: np.ndarray,
+                            rng: np.random.Generator) -> CircuitBatch:
+        n, width = mask.shape
+        rows = np.arange(n)
+        lengths = mask.sum(axis=1)
+        flow_start, flow_control_point, flow_end = np.zeros((3, n, width, 2))
+        has_flow = np.zeros((n, width), dtype=bool)
+
+        # Sections depend on the corrected previous one, so walk them in order, all circuits at once
+        for j in range(width):
+            active = j < lengths
+            previous = lengths - 1 if j == 0 else np.full(n, j - 1)
+            previous_is_turn = n_control_points[rows, previous] > 0
+            previous_end = end[rows, previous]
+            previous_control_point = control_points[rows, previous, np.maximum(n_control_points[rows, previous] - 1, 0)]
+            is_turn = n_control_points[:, j] > 0
+
+            correct = active & is_turn & previous_is_turn
+            ratio = rng.uniform(self.CP_RATIO_MIN, 1, (n, 1))
+            control_points[correct, j, 0] = \
+                (start[:, j] + (previous_end - previous_control_point) * ratio)[correct]
+
+            flow = active & ~is_turn & previous_is_turn \
+                & (np.linalg.norm(end[:, j] - start[:, j], axis=-1) > self.SHORT_STRAIGHT_THRESHOLD)
+            turn_start = previous_control_point + rng.uniform(
+                self.SSR_MIN * self.SSR_MIN, self.SSR_MAX * self.SSR_MAX, (n, 1)
+            ) * (previous_end - previous_control_point)
+            turn_end = start[:, j] + rng.uniform(self.SER_MIN, self.SER_MAX, (n, 1)) * (end[:, j] - start[:, j])
+            has_flow[:, j] = flow
+            flow_start[flow, j], flow_control_point[flow, j], flow_end[flow, j] = \
+                turn_start[flow], start[flow, j], turn_end[flow]
+            end[rows[flow], previous[flow]] = turn_start[flow]
+            start[flow, j] = turn_end[flow]
+
+        flow_control_points = np.stack([flow_control_point, np.zeros_like(flow_control_point)], axis=2)
+        mask, start, end, control_points, n_control_points = _compact(
+            np.stack([has_flow, mask], axis=2).reshape(n, 2 * width),
+            np.stack([flow_start, start], axis=2).reshape(n, 2 * width, 2),
+            np.stack([flow_end, end], axis=2).reshape(n, 2 * width, 2),
+            np.stack([flow_control_points, control_points], axis=2).reshape(n, 2 * width, 2, 2),
+            np.stack([has_flow.astype(int), n_control_points], axis=2).reshape(n, 2 * width)
+        )
+        return CircuitBatch(start, end, control_points, n_control_points, mask)
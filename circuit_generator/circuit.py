@@ -1,10 +1,12 @@
-from typing import List, Union, Dict
+from math import ceil, isclose
+from typing import List, Union, Dict, Optional, Tuple
 
 import numpy as np
 from datatypes.collections import CyclicList
 from datatypes.geometry import Point2D, Vector2D
 
 from circuit_generator.sections import BezierTurn, Straight, Segment
+from circuit_generator.transform import AffineTransform
 
 
 class CircuitPerimeter:
@@ -25,7 +27,7 @@ class CircuitPerimeter:
     def __add__(self, other):
         if not isinstance(other, Vector2D):
             return NotImplemented
-        return CircuitPerimeter([Segment(s.a + other, s.b + other) for s in self])
+        return self.transformed(AffineTransform.translation(other))
 
     def __radd__(self, other):
         return self + other
@@ -33,10 +35,7 @@ class CircuitPerimeter:
     def __mul__(self, other):
         if not np.isreal(other):
             return NotImplemented
-        if other == 0:
-            zero = Point2D(x=0, y=0)
-            CircuitPerimeter(CyclicList([Segment(zero, zero) for _ in self]))
-        return CircuitPerimeter(CyclicList([Segment(s.a * other, s.b * other) for s in self]))
+        return self.transformed(AffineTransform.scaling(other))
 
     def __rmul__(self, other):
         return self * other
@@ -46,7 +45,17 @@ class CircuitPerimeter:
             return NotImplemented
         if other == 0:
             raise ZeroDivisionError
-        return CircuitPerimeter(CyclicList([Segment(s.a / other, s.b / other) for s in self]))
+        return self.transformed(AffineTransform.scaling(1 / other))
+
+    def transformed(self, transform: AffineTransform):
+        return CircuitPerimeterView(self, transform)
+
+    def intersects_with(self, segment: Segment) -> bool:
+        return any(s.intersects_with(segment) for s in self)
+
+    def intersections(self, segment: Segment) -> List[Point2D]:
+        points = (s.intersection(segment) for s in self)
+        return [p for p in points if p is not None]
 
     def __eq__(self, other):
         if not isinstance(other, CircuitPerimeter):
@@ -54,9 +63,151 @@ class CircuitPerimeter:
         return self.segments == other.segments
 
 
+class CircuitPerimeterView(CircuitPerimeter):
+    """
+    Read-only CircuitPerimeter under an affine transform. Segments are shared
+    with the base perimeter and only transformed when read; queries are
+    answered by moving the query into the base frame instead.
+    """
+    def __init__(self, base: CircuitPerimeter, transform: AffineTransform):
+        # Compose nested views so every view points straight at untransformed geometry
+        if isinstance(base, CircuitPerimeterView):
+            transform = transform @ base.transform
+            base = base.base
+        self.base: CircuitPerimeter = base
+        self.transform: AffineTransform = transform
+
+    @property
+    def segments(self) -> CyclicList:
+        return CyclicList(list(self))
+
+    def _transform_segment(self, segment: Segment, transform: Optional[AffineTransform] = None) -> Segment:
+        transform = transform or self.transform
+        return Segment(transform.apply(segment.a), transform.apply(segment.b))
+
+    def __getitem__(self, item):
+        segments = self.base[item]
+        if isinstance(segments, Segment):
+            return self._transform_segment(segments)
+        return [self._transform_segment(s) for s in segments]
+
+    def __setitem__(self, pos, item):
+        raise TypeError('CircuitPerimeterView object is read-only.')
+
+    def __iter__(self):
+        return (self._transform_segment(s) for s in self.base)
+
+    def intersects_with(self, segment: Segment) -> bool:
+        # Segment intersection is affine invariant, so test the base against the mapped query
+        if self.transform.determinant() == 0:
+            return super().intersects_with(segment)
+        return self.base.intersects_with(self._transform_segment(segment, self.transform.inverse()))
+
+    def intersections(self, segment: Segment) -> List[Point2D]:
+        if self.transform.determinant() == 0:
+            return super().intersections(segment)
+        local_segment = self._transform_segment(segment, self.transform.inverse())
+        return [self.transform.apply(p) for p in self.base.intersections(local_segment)]
+
+
+class PerimeterPyramid:
+    """
+    Perimeters of the same circuit at decreasing sample densities. Level 0 is the
+    finest one and every coarser level keeps every other sample point of the
+    previous one, so segment j of level k covers segments 2j and 2j + 1 of level
+    k - 1 and all levels share the same Point2D objects.
+    """
+    def __init__(self, levels: List[CircuitPerimeter], errors: List[float], sample_rate: float):
+        self.levels = levels
+        # Maximum distance from a fine sample point to the coarse segment replacing it
+        self.errors = errors
+        self.sample_rate = sample_rate
+
+    @staticmethod
+    def from_sections(section_list: List[Union[Straight, BezierTurn]], sample_rate: float = 10, levels: int = 4):
+        assert levels > 0
+        step = 2 ** (levels - 1)
+        points = []
+        for section in section_list:
+            # Every section gets a multiple of 2^(levels-1) fine segments so decimation stays aligned
+            # Rounding up keeps level 0 spacing within sample_rate
+            coarse_segments = max(ceil(section.length() / (sample_rate * step)), 1)
+            points.extend(section.sample(coarse_segments * step + 1)[:-1])
+        return PerimeterPyramid.from_points(points, sample_rate, levels)
+
+    @staticmethod
+    def from_points(points: List[Point2D], sample_rate: float = 10, levels: int = 4):
+        assert levels > 0 and len(points) % 2 ** (levels - 1) == 0
+        coordinates = np.array([[p.x, p.y] for p in points], dtype=float)
+        perimeters, errors = [], []
+        for level in range(levels):
+            level_points = points[::2 ** level]
+            perimeters.append(CircuitPerimeter([Segment(p, level_points[(i + 1) % len(level_points)])
+                                                for i, p in enumerate(level_points)]))
+            errors.append(PerimeterPyramid._chord_error(coordinates, 2 ** level))
+        return PerimeterPyramid(perimeters, errors, sample_rate)
+
+    @staticmethod
+    def _chord_error(coordinates: np.ndarray, step: int) -> float:
+        start = coordinates[::step]
+        chord = np.roll(start, -1, axis=0) - start
+        squared_length = np.sum(chord * chord, axis=1)
+        error = 0.
+        for offset in range(1, step):
+            v = coordinates[offset::step] - start
+            # Project onto the chord segment, not the infinite line, so hairpins are not underestimated
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t = np.clip(np.nan_to_num(np.sum(v * chord, axis=1) / squared_length), 0, 1)
+            distance = np.linalg.norm(v - t[:, None] * chord, axis=1)
+            error = max(error, float(distance.max()))
+        return error
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, level) -> CircuitPerimeter:
+        return self.levels[level]
+
+    def __iter__(self):
+        return iter(self.levels)
+
+    def sample_rate_at(self, level: int) -> float:
+        return self.sample_rate * 2 ** level
+
+    def level_for_tolerance(self, tolerance: float) -> int:
+        """
+        Coarsest level whose error is within tolerance
+        """
+        return max(level for level, error in enumerate(self.errors) if error <= tolerance or level == 0)
+
+    def refine(self, level: int, index: int, target_level: int = 0) -> range:
+        """
+        Indices of the segments in target_level covered by a segment of a coarser level
+        """
+        assert 0 <= target_level <= level
+        factor = 2 ** (level - target_level)
+        return range(index * factor, (index + 1) * factor)
+
+    def coarsen(self, level: int, index: int, target_level: int) -> int:
+        """
+        Index of the segment in target_level that covers a segment of a finer level
+        """
+        assert level <= target_level < len(self.levels)
+        return index // 2 ** (target_level - level)
+
+    def transformed(self, transform: AffineTransform):
+        scale = transform.similarity_scale()
+        if scale is None:
+            raise ValueError('Pyramid errors are only preserved by similarity transforms.')
+        return PerimeterPyramid([p.transformed(transform) for p in self.levels],
+                                [e * scale for e in self.errors],
+                                self.sample_rate * scale)
+
+
 class Circuit:
     def __init__(self):
         self._section_list: List[Union[Straight, BezierTurn]] = []
+        self._perimeter_pyramids: Dict[Tuple[float, int], PerimeterPyramid] = {}
 
     def length(self, samples=10):
         return np.sum(np.array([s.length() if isinstance(s, Straight) else s.length(samples)
@@ -103,6 +254,32 @@ class Circuit:
     def __getitem__(self, item):
         return self._section_list[item]
 
+    def __add__(self, other):
+        if not isinstance(other, Vector2D):
+            return NotImplemented
+        return self.transformed(AffineTransform.translation(other))
+
+    def __radd__(self, other):
+        return self + other
+
+    def __mul__(self, other):
+        if not np.isreal(other):
+            return NotImplemented
+        return self.transformed(AffineTransform.scaling(other))
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __truediv__(self, other):
+        if not np.isreal(other):
+            return NotImplemented
+        if other == 0:
+            raise ZeroDivisionError
+        return self.transformed(AffineTransform.scaling(1 / other))
+
+    def transformed(self, transform: AffineTransform):
+        return CircuitView(self, transform)
+
     def to_perimeter(self, sample_rate: int = 10) -> CircuitPerimeter:
         sampled_circuit = CyclicList([])
         for section in self._section_list:
@@ -113,3 +290,90 @@ class Circuit:
         for i, point in enumerate(sampled_circuit):
             perimeter.append(Segment(point, sampled_circuit[i + 1]))
         return CircuitPerimeter(CyclicList(perimeter))
+
+    def perimeter_pyramid(self, sample_rate: float = 10, levels: int = 4) -> PerimeterPyramid:
+        """
+        Cached level-of-detail perimeters, level k sampled roughly every sample_rate * 2^k.
+        Sections edited in place after this call are not noticed, call
+        invalidate_perimeter_pyramids afterwards.
+        """
+        key = (sample_rate, levels)
+        if key not in self._perimeter_pyramids:
+            self._perimeter_pyramids[key] = PerimeterPyramid.from_sections(self._section_list, sample_rate, levels)
+        return self._perimeter_pyramids[key]
+
+    def invalidate_perimeter_pyramids(self):
+        self._perimeter_pyramids.clear()
+
+
+class CircuitView(Circuit):
+    """
+    Read-only Circuit under an affine transform. Sections are shared with the
+    base circuit and only transformed when read.
+    """
+    def __init__(self, base: Circuit, transform: AffineTransform):
+        if isinstance(base, CircuitView):
+            transform = transform @ base.transform
+            base = base.base
+        self.base: Circuit = base
+        self.transform: AffineTransform = transform
+        self._perimeter_pyramids: Dict[Tuple[float, int], PerimeterPyramid] = {}
+
+    @property
+    def _section_list(self) -> List[Union[Straight, BezierTurn]]:
+        return list(self)
+
+    def _transform_section(self, section: Union[Straight, BezierTurn]) -> Union[Straight, BezierTurn]:
+        apply = self.transform.apply
+        if isinstance(section, Straight):
+            return Straight(apply(section.start), apply(section.end))
+        # Bézier curves are affine invariant, so transforming the control points is exact
+        return BezierTurn(apply(section.start), [apply(p) for p in section.control_points], apply(section.end))
+
+    def __iter__(self):
+        return (self._transform_section(s) for s in self.base)
+
+    def __getitem__(self, item):
+        sections = self.base[item]
+        if isinstance(sections, list):
+            return [self._transform_section(s) for s in sections]
+        return self._transform_section(sections)
+
+    def length(self, samples=10):
+        scale = self.transform.similarity_scale()
+        if scale is None:
+            return super().length(samples)
+        return self.base.length(samples) * scale
+
+    def to_perimeter(self, sample_rate: int = 10) -> CircuitPerimeter:
+        """
+        Like Circuit.to_perimeter, every call samples the base circuit anew, so
+        perimeters of different views do not share geometry; perimeter_pyramid does.
+        """
+        # Sampling the base at a rescaled rate gives the same point counts
+        # as sampling the transformed circuit (up to rounding), so the perimeter can stay a view
+        scale = self.transform.similarity_scale()
+        if not scale:
+            return super().to_perimeter(sample_rate)
+        return CircuitPerimeterView(self.base.to_perimeter(sample_rate / scale), self.transform)
+
+    def perimeter_pyramid(self, sample_rate: float = 10, levels: int = 4) -> PerimeterPyramid:
+        """
+        Views that do not scale share the base circuit's cached pyramid. Scaled
+        views cache their own one, so continuous scales do not pile up on the base.
+        """
+        scale = self.transform.similarity_scale()
+        if scale is not None and isclose(scale, 1):
+            return self.base.perimeter_pyramid(sample_rate, levels).transformed(self.transform)
+        key = (sample_rate, levels)
+        if key not in self._perimeter_pyramids:
+            if scale:
+                pyramid = PerimeterPyramid.from_sections(self.base._section_list, sample_rate / scale, levels)
+                self._perimeter_pyramids[key] = pyramid.transformed(self.transform)
+            else:
+                self._perimeter_pyramids[key] = PerimeterPyramid.from_sections(self._section_list, sample_rate, levels)
+        return self._perimeter_pyramids[key]
+
+    def invalidate_perimeter_pyramids(self):
+        self._perimeter_pyramids.clear()
+        self.base.invalidate_perimeter_pyramids()
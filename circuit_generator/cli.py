@@ -0,0 +1,172 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Any, Dict, List, Optional, Tuple
+
+from circuit_generator.atomic import write_atomic
+from circuit_generator.generator import CircuitGenerator
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# CircuitGenerator parameters feeding random.randint, everything else is a float
+_INTEGER_PARAMETERS = {'coordinate_range', 'n_points', 'consecutive_turns_maximum'}
+
+
+def generator_defaults() -> Dict[str, Any]:
+    signature = inspect.signature(CircuitGenerator.__init__)
+    return {name: p.default for name, p in signature.parameters.items() if name != 'self'}
+
+
+def generate_layouts(params: Dict[str, Any], seed: int, start: int, count: int) -> List[list]:
+    return [c.to_dicts() for c in CircuitGenerator(**params).iter_layouts(seed, limit=count, start=start)]
+
+
+def shard_name(shard: int) -> str:
+    return f'shard-{shard:05d}.json'
+
+
+def _build_shard(task: Tuple[int, int, int, int, Dict[str, Any], str]) -> Tuple[int, int]:
+    shard, start, count, seed, params, out = task
+    layouts = generate_layouts(params, seed, start, count)
+    write_atomic(os.path.join(out, shard_name(shard)), lambda f: json.dump(layouts, f, default=float))
+    return shard, count
+
+
+def load_manifest(out: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    path = os.path.join(out, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {**settings, 'shards': {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    previous = {key: manifest.get(key) for key in settings}
+    if previous != settings:
+        raise ValueError(f'{path} was written with different settings, use another output directory.')
+    # Only trust shards whose file is still there
+    manifest['shards'] = {name: entry for name, entry in manifest['shards'].items()
+                          if os.path.exists(os.path.join(out, entry['file']))}
+    return manifest
+
+
+def build(count: int, out: str, seed: int = 0, shard_size: int = 1000, workers: int = 1,
+          params: Optional[Dict[str, Any]] = None, log=sys.stderr) -> Dict[str, Any]:
+    """
+    Generate count layouts into fixed-size JSON shards under out, skipping
+    shards already recorded in the manifest
+    """
+    assert count >= 0 and shard_size > 0 and workers > 0
+    params = {**generator_defaults(), **(params or {})}
+    os.makedirs(out, exist_ok=True)
+    settings = {
+        'version': MANIFEST_VERSION, 'seed': seed, 'count': count, 'shard_size': shard_size,
+        # Round-trip through JSON so tuples compare equal to the lists read back
+        'generator': json.loads(json.dumps(params))
+    }
+    manifest = load_manifest(out, settings)
+
+    total = -(-count // shard_size)
+    tasks = [(shard, start, min(shard_size, count - start), seed, params, out)
+             for shard, start in enumerate(range(0, count, shard_size))
+             if shard_name(shard) not in manifest['shards']]
+    if len(tasks) < total:
+        print(f'Resuming: {total - len(tasks)}/{total} shards already complete', file=log)
+
+    started, generated = time.perf_counter(), 0
+    with Pool(workers) as pool:
+        for shard, shard_count in pool.imap_unordered(_build_shard, tasks):
+            manifest['shards'][shard_name(shard)] = {'file': shard_name(shard), 'layouts': shard_count}
+            write_atomic(os.path.join(out, MANIFEST_NAME), lambda f: json.dump(manifest, f))
+            generated += shard_count
+            elapsed = time.perf_counter() - started
+            print(f'{shard_name(shard)}: {len(manifest["shards"])}/{total} shards, '
+                  f'{generated / elapsed:.1f} layouts/s', file=log)
+    elapsed = time.perf_counter() - started
+    print(f'Generated {generated} layouts in {elapsed:.1f}s', file=log)
+    return manifest
+
+
+def check_generator_parameter(name: str, value) -> Optional[str]:
+    """
+    Error message if value does not fit the CircuitGenerator parameter name, None otherwise
+    """
+    default = generator_defaults()[name]
+    value_types = (int,) if name in _INTEGER_PARAMETERS else (int, float)
+    values = value if isinstance(default, tuple) else [value]
+    if isinstance(default, tuple) and (not isinstance(value, list) or len(value) != len(default)):
+        return f'{name} must be a list of {len(default)} values'
+    if not all(isinstance(v, value_types) and not isinstance(v, bool) for v in values):
+        return f'{name} must be {"integer" if name in _INTEGER_PARAMETERS else "numeric"}'
+    return None
+
+
+def check_generator_ranges(params: Dict[str, Any]) -> List[str]:
+    """
+    Error messages for (minimum, maximum) pairs of tuple parameters that are reversed
+    """
+    errors = []
+    for name, value in params.items():
+        if isinstance(generator_defaults()[name], tuple):
+            for low, high in zip(value[::2], value[1::2]):
+                if low > high:
+                    errors.append(f'{name} has minimum {low} above maximum {high}')
+    return errors
+
+
+def _add_generator_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group('generator parameters', 'Override CircuitGenerator defaults')
+    for name, default in generator_defaults().items():
+        value_type = int if name in _INTEGER_PARAMETERS else float
+        group.add_argument(f'--{name.replace("_", "-")}', dest=name, type=value_type, default=None,
+                           nargs=len(default) if isinstance(default, tuple) else None,
+                           metavar=name.upper(), help=f'default: {default}')
+
+
+def parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='circuit-generator',
+                                     description='A random generator of kinda-realistic racing circuit layouts.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='Generate a sharded dataset of layouts')
+    build_parser.add_argument('--count', type=int, required=True, help='Number of layouts')
+    build_parser.add_argument('--out', required=True, help='Output directory')
+    build_parser.add_argument('--seed', type=int, default=0)
+    build_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    build_parser.add_argument('--shard-size', type=int, default=1000, help='Layouts per shard')
+    build_parser.add_argument('--config', help='JSON file with CircuitGenerator parameters')
+    _add_generator_arguments(build_parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_arguments(argv)
+    params = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            print(f'{args.config} must contain a JSON object', file=sys.stderr)
+            return 2
+        params.update(config)
+    unknown = set(params) - set(generator_defaults())
+    if unknown:
+        print(f'Unknown generator parameters in {args.config}: {", ".join(sorted(unknown))}', file=sys.stderr)
+        return 2
+    errors = [e for e in (check_generator_parameter(name, value) for name, value in params.items()) if e]
+    if errors:
+        print(f'Invalid generator parameters in {args.config}: {"; ".join(errors)}', file=sys.stderr)
+        return 2
+    params.update({name: getattr(args, name) for name in generator_defaults() if getattr(args, name) is not None})
+    params = {name: tuple(value) if isinstance(value, list) else value for name, value in params.items()}
+    errors = check_generator_ranges(params)
+    if errors:
+        print(f'Invalid generator parameters: {"; ".join(errors)}', file=sys.stderr)
+        return 2
+    try:
+        build(args.count, args.out, args.seed, args.shard_size, args.workers, params)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
@@ -1,6 +1,10 @@
+import os
 import random
+from collections import deque
+from itertools import count
 from math import tau
-from typing import Optional, List, Union
+from multiprocessing import Pool
+from typing import Optional, List, Union, Iterator, Dict
 
 from datatypes.geometry import Point2D, Vector2D
 
@@ -13,6 +17,26 @@ def displace(point: Point2D, max_radius: float):
     return point + displacement_vector
 
 
+def layout_seed(seed: int, index: int) -> str:
+    """
+    Per-layout seed, so a layout only depends on the run seed and its index
+    and not on the order or process it was generated in
+    """
+    return f'{seed}:{index}'
+
+
+_worker_generator: Optional['CircuitGenerator'] = None
+
+
+def _init_worker(generator: 'CircuitGenerator'):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _generate_worker_layout(seed: int, index: int) -> List[Dict[str, Union[str, list]]]:
+    return _worker_generator.generate_seeded_layout(seed, index).to_dicts()
+
+
 class CircuitGenerator:
     def __init__(self,
                  coordinate_range=(-500, 500, -500, 500), n_points=(9, 12),
@@ -55,6 +79,45 @@ class CircuitGenerator:
         self._last_layout: Optional[Circuit] = None
 
     def generate_layout(self):
+        circuit = self._build_layout()
+        self._last_layout = Circuit.from_objects(circuit)
+        return circuit
+
+    def generate_seeded_layout(self, seed: int, index: int) -> Circuit:
+        """
+        Layout number index of the stream for seed. The random module is reseeded
+        for the build and its previous state restored afterwards.
+        """
+        state = random.getstate()
+        random.seed(layout_seed(seed, index))
+        try:
+            return Circuit.from_objects(self._build_layout())
+        finally:
+            random.setstate(state)
+
+    def iter_layouts(self, seed: int, limit: Optional[int] = None, prefetch: int = 0,
+                     start: int = 0, workers: Optional[int] = None) -> Iterator[Circuit]:
+        """
+        Lazily yield layouts start, start + 1, ... of the stream for seed, forever
+        if limit is None. With prefetch > 0 layouts are generated in worker
+        processes, keeping at most prefetch of them in flight. Nothing is kept
+        once yielded, and the output is the same with or without prefetching.
+        """
+        indices = count(start) if limit is None else range(start, start + limit)
+        if prefetch <= 0:
+            for index in indices:
+                yield self.generate_seeded_layout(seed, index)
+            return
+        with Pool(workers or os.cpu_count(), initializer=_init_worker, initargs=(self,)) as pool:
+            pending = deque()
+            for index in indices:
+                pending.append(pool.apply_async(_generate_worker_layout, (seed, index)))
+                if len(pending) >= prefetch:
+                    yield Circuit.from_dicts(pending.popleft().get())
+            while pending:
+                yield Circuit.from_dicts(pending.popleft().get())
+
+    def _build_layout(self) -> List[Union[Straight, BezierTurn]]:
         points = self._generate_random_points()
         points = self._order_points_by_angle(points)
         points = self._correct_very_small_angles(points)
@@ -62,9 +125,7 @@ class CircuitGenerator:
         circuit = self._avoid_too_many_consecutive_turns(circuit)
         circuit = self._create_turns_after_straights(circuit)
         circuit = self._create_turns(circuit)
-        circuit = self._correct_circuit_flow(circuit)
-        self._last_layout = Circuit.from_objects(circuit)
-        return circuit
+        return self._correct_circuit_flow(circuit)
 
     def _generate_random_points(self) -> List[Point2D]:
         """
@@ -0,0 +1,151 @@
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Iterable, List
+
+import numpy as np
+from datatypes.geometry import Point2D
+
+from circuit_generator.atomic import write_atomic
+from circuit_generator.circuit import Circuit
+from circuit_generator.sections import Straight, BezierTurn
+
+STRAIGHT, BEZIER_TURN = 0, 1
+
+
+class LayoutSink(ABC):
+    """
+    Incremental writer for a stream of circuits, to be used as a context manager.
+    Leaving the context because of an exception closes the sink without its
+    final flush; what happens to unflushed circuits depends on the sink.
+    """
+    @abstractmethod
+    def write(self, circuit: Circuit) -> None:
+        pass
+
+    def write_all(self, circuits: Iterable[Circuit]) -> int:
+        written = 0
+        for circuit in circuits:
+            self.write(circuit)
+            written += 1
+        return written
+
+    def flush(self) -> None:
+        pass
+
+    def close(self, flush: bool = True) -> None:
+        if flush:
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(flush=exc_type is None)
+
+
+class JsonLinesSink(LayoutSink):
+    """
+    One Circuit.to_dicts() list per line, flushed to disk every flush_every circuits.
+    Closing without flushing still hands the lines already written to the OS,
+    every one of them complete, but does not fsync them.
+    """
+    def __init__(self, path: str, flush_every: int = 1000, append: bool = False):
+        assert flush_every > 0
+        self.flush_every = flush_every
+        self._file = open(path, 'a' if append else 'w')
+        self._unflushed = 0
+
+    def write(self, circuit: Circuit) -> None:
+        self._file.write(json.dumps(circuit.to_dicts(), default=float) + '\n')
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed = 0
+
+    def close(self, flush: bool = True) -> None:
+        if not self._file.closed:
+            if flush:
+                self.flush()
+            self._file.close()
+
+
+class ShardSink(LayoutSink):
+    """
+    Binary .npz shards of shard_size circuits each, written atomically once full.
+    Circuits are stored as flat arrays: all points, the point offset of every
+    section, section types and the section offset of every circuit. Numbering
+    continues after the shards already in directory. Closing without flushing
+    drops the circuits of the incomplete shard.
+    """
+    def __init__(self, directory: str, shard_size: int = 1000, prefix: str = 'shard'):
+        assert shard_size > 0
+        os.makedirs(directory, exist_ok=True)
+        self.directory, self.shard_size, self.prefix = directory, shard_size, prefix
+        self.shards: List[str] = []
+        self._buffer: List[Circuit] = []
+        pattern = re.compile(rf'{re.escape(prefix)}-(\d+)\.npz')
+        existing = [int(m.group(1)) for m in map(pattern.fullmatch, os.listdir(directory)) if m]
+        self._next_shard = max(existing, default=-1) + 1
+
+    def write(self, circuit: Circuit) -> None:
+        self._buffer.append(circuit)
+        if len(self._buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        path = os.path.join(self.directory, f'{self.prefix}-{self._next_shard:05d}.npz')
+        arrays = circuits_to_arrays(self._buffer)
+        write_atomic(path, lambda f: np.savez(f, **arrays), binary=True)
+        self.shards.append(path)
+        self._next_shard += 1
+        self._buffer = []
+
+    def close(self, flush: bool = True) -> None:
+        super().close(flush)
+        self._buffer = []
+
+
+def circuits_to_arrays(circuits: Iterable[Circuit]):
+    points, section_offsets, section_types, circuit_offsets = [], [0], [], [0]
+    for circuit in circuits:
+        for section in circuit:
+            if isinstance(section, Straight):
+                section_points = [section.start, section.end]
+                section_types.append(STRAIGHT)
+            else:
+                section_points = [section.start, *section.control_points, section.end]
+                section_types.append(BEZIER_TURN)
+            points.extend([p.x, p.y] for p in section_points)
+            section_offsets.append(len(points))
+        circuit_offsets.append(len(section_types))
+    return {
+        'points': np.array(points, dtype=float).reshape(-1, 2),
+        'section_offsets': np.array(section_offsets, dtype=np.int64),
+        'section_types': np.array(section_types, dtype=np.uint8),
+        'circuit_offsets': np.array(circuit_offsets, dtype=np.int64)
+    }
+
+
+def read_shard(path: str) -> List[Circuit]:
+    with np.load(path) as shard:
+        points = [Point2D(*p) for p in shard['points'].tolist()]
+        section_offsets = shard['section_offsets'].tolist()
+        section_types = shard['section_types'].tolist()
+        circuit_offsets = shard['circuit_offsets'].tolist()
+    sections = []
+    for i, section_type in enumerate(section_types):
+        section_points = points[section_offsets[i]:section_offsets[i + 1]]
+        if section_type == STRAIGHT:
+            sections.append(Straight(*section_points))
+        else:
+            sections.append(BezierTurn(section_points[0], section_points[1:-1], section_points[-1]))
+    return [Circuit.from_objects(sections[circuit_offsets[i]:circuit_offsets[i + 1]])
+            for i in range(len(circuit_offsets) - 1)]
@@ -0,0 +1,68 @@
+from math import sqrt
+from typing import Optional
+
+import numpy as np
+from datatypes.geometry import Point2D, Vector2D
+
+
+class AffineTransform:
+    """
+    2D affine transform stored as a homogeneous 3x3 matrix
+    """
+    def __init__(self, matrix=None):
+        self.matrix: np.ndarray = np.identity(3) if matrix is None else np.array(matrix, dtype=float)
+        # Plain floats make applying the transform to single points much cheaper than numpy
+        (a, b, c), (d, e, f) = self.matrix[:2].tolist()
+        self._coefficients = (a, b, c, d, e, f)
+        self._inverse: Optional[AffineTransform] = None
+
+    @staticmethod
+    def translation(vector: Vector2D):
+        v = vector.to_cartesian()
+        return AffineTransform([[1, 0, v.x], [0, 1, v.y], [0, 0, 1]])
+
+    @staticmethod
+    def scaling(factor: float):
+        return AffineTransform([[factor, 0, 0], [0, factor, 0], [0, 0, 1]])
+
+    def apply(self, point: Point2D) -> Point2D:
+        a, b, c, d, e, f = self._coefficients
+        return Point2D(a * point.x + b * point.y + c, d * point.x + e * point.y + f)
+
+    def determinant(self) -> float:
+        return float(np.linalg.det(self.matrix[:2, :2]))
+
+    def inverse(self):
+        if self._inverse is None:
+            if self.determinant() == 0:
+                raise ValueError('Transform is not invertible.')
+            self._inverse = AffineTransform(np.linalg.inv(self.matrix))
+        return self._inverse
+
+    def similarity_scale(self) -> Optional[float]:
+        """
+        Uniform scale factor if the transform preserves angles (translation,
+        rotation and uniform scaling only), None otherwise
+        """
+        linear = self.matrix[:2, :2]
+        gram = linear.T @ linear
+        # Tolerance relative to the scale, an absolute one would accept any tiny shear
+        if not np.allclose(gram, gram[0, 0] * np.identity(2), rtol=0, atol=1e-9 * abs(gram[0, 0])):
+            return None
+        return sqrt(gram[0, 0])
+
+    def __matmul__(self, other):
+        """
+        Composition: (self @ other) applies other first, then self
+        """
+        if not isinstance(other, AffineTransform):
+            return NotImplemented
+        return AffineTransform(self.matrix @ other.matrix)
+
+    def __eq__(self, other):
+        if not isinstance(other, AffineTransform):
+            return False
+        return np.array_equal(self.matrix, other.matrix)
+
+    def __repr__(self):
+        return f'AffineTransform({self.matrix.tolist()})'
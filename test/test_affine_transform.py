@@ -0,0 +1,35 @@
+from unittest import TestCase
+from datatypes.geometry import Point2D, Vector2D
+
+from circuit_generator.transform import AffineTransform
+
+
+class TestAffineTransform(TestCase):
+    def test_init(self):
+        t = AffineTransform()
+        self.assertEqual(t.apply(Point2D(100, 50)), Point2D(100, 50))
+
+    def test_translation(self):
+        t = AffineTransform.translation(Vector2D(100, 50))
+        self.assertEqual(t.apply(Point2D(300, 0)), Point2D(400, 50))
+
+    def test_scaling(self):
+        t = AffineTransform.scaling(2)
+        self.assertEqual(t.apply(Point2D(300, 150)), Point2D(600, 300))
+
+    def test_compose(self):
+        t = AffineTransform.scaling(2) @ AffineTransform.translation(Vector2D(100, 50))
+        self.assertEqual(t.apply(Point2D(0, 0)), Point2D(200, 100))
+
+    def test_inverse(self):
+        t = AffineTransform.scaling(2) @ AffineTransform.translation(Vector2D(100, 50))
+        self.assertEqual(t.inverse().apply(Point2D(200, 100)), Point2D(0, 0))
+        with self.assertRaises(ValueError):
+            AffineTransform.scaling(0).inverse()
+
+    def test_similarity_scale(self):
+        self.assertEqual(AffineTransform.scaling(3).similarity_scale(), 3)
+        self.assertEqual(AffineTransform([[1, 1, 0], [0, 1, 0], [0, 0, 1]]).similarity_scale(), None)
+        self.assertEqual(AffineTransform([[0, -2, 0], [2, 0, 0], [0, 0, 1]]).similarity_scale(), 2)
+        self.assertEqual(AffineTransform([[1e-5, 1e-5, 0], [0, 1e-5, 0], [0, 0, 1]]).similarity_scale(), None)
+        self.assertAlmostEqual(AffineTransform.scaling(1e-5).similarity_scale(), 1e-5)
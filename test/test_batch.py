@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+import numpy as np
+
+from circuit_generator.batch import BatchCircuitGenerator
+from circuit_generator.circuit import Circuit
+from circuit_generator.sections import Straight, BezierTurn
+
+
+class TestBatchCircuitGenerator(TestCase):
+    def test_generate_batch(self):
+        b = BatchCircuitGenerator().generate_batch(200, seed=0)
+        self.assertEqual([len(b), b.mask.shape, bool(np.all(b.lengths() >= 3))], [200, (200, 48), True])
+
+    def test_deterministic(self):
+        g = BatchCircuitGenerator()
+        b, c = g.generate_batch(50, seed=3), g.generate_batch(50, seed=3)
+        self.assertEqual([np.array_equal(b.start, c.start), np.array_equal(b.control_points, c.control_points)],
+                         [True, True])
+
+    def test_continuity(self):
+        b = BatchCircuitGenerator().generate_batch(200, seed=1)
+        for i, length in enumerate(b.lengths()):
+            self.assertTrue(np.allclose(b.end[i, :length], np.roll(b.start[i, :length], -1, axis=0)))
+
+    def test_to_circuits(self):
+        b = BatchCircuitGenerator().generate_batch(10, seed=2)
+        circuits = b.to_circuits()
+        self.assertEqual([len(circuits), type(circuits[0]), len(list(circuits[0]))],
+                         [10, Circuit, b.lengths()[0]])
+        for section, n_control_points in zip(circuits[0], b.n_control_points[0]):
+            self.assertIsInstance(section, Straight if n_control_points == 0 else BezierTurn)
+
+    def test_consecutive_turns(self):
+        g = BatchCircuitGenerator()
+        counts = np.array([9, 9, 12])
+        is_straight = np.zeros((3, 12), dtype=bool)
+        is_straight[1, 4] = True
+        rng = np.random.default_rng(0)
+        points, random_counts = g._generate_batch_points(2000, rng)
+        for straights, row_counts in [(is_straight, counts),
+                                      (g._detect_batch_straights(points, random_counts, rng), random_counts)]:
+            straights = g._avoid_too_many_consecutive_batch_turns(straights, row_counts)
+            for row, n in zip(straights, row_counts):
+                # Longest run of turns, going around the circuit twice to catch runs that wrap
+                runs = np.diff(np.flatnonzero(np.concatenate([row[:n], row[:n]])))
+                self.assertLessEqual(runs.max() - 1, g.MAX_CONSECUTIVE_TURNS)
+
+    def test_too_few_points(self):
+        with self.assertRaises(ValueError):
+            BatchCircuitGenerator(n_points=(2, 2)).generate_batch(5)
@@ -1,9 +1,9 @@
 from unittest import TestCase
 
 from datatypes.collections import CyclicList
-from datatypes.geometry import Point2D
+from datatypes.geometry import Point2D, Vector2D
 
-from circuit_generator.circuit import Circuit, CircuitPerimeter
+from circuit_generator.circuit import Circuit, CircuitPerimeter, PerimeterPyramid
 from circuit_generator.sections import Straight, BezierTurn, Segment
 
 
@@ -79,3 +79,76 @@ class TestCircuit(TestCase):
              s1.length() + s2.length(25) + s3.length(),
              s1.length() + s2.length(50) + s3.length()]
         )
+
+    def test_transform_view(self):
+        s1 = Straight(Point2D(0, 100), Point2D(300, 200))
+        s2 = BezierTurn(Point2D(300, 200), [Point2D(200, 300)], Point2D(300, 500))
+        c = Circuit.from_objects([s1, s2])
+        d = 2 * c + Vector2D(100, 0)
+        self.assertEqual(
+            [d.base is c, list(d)],
+            [True, [Straight(Point2D(100, 200), Point2D(700, 400)),
+                    BezierTurn(Point2D(700, 400), [Point2D(500, 600)], Point2D(700, 1000))]]
+        )
+        self.assertAlmostEqual(d.length(), 2 * c.length())
+
+    def test_perimeter_pyramid(self):
+        c = Circuit.from_objects([
+            Straight(Point2D(0, 0), Point2D(320, 0)),
+            Straight(Point2D(320, 0), Point2D(320, 320)),
+            Straight(Point2D(320, 320), Point2D(0, 320)),
+            Straight(Point2D(0, 320), Point2D(0, 0))
+        ])
+        p = c.perimeter_pyramid(sample_rate=10, levels=3)
+        self.assertEqual([len(p), [len(list(level)) for level in p], p.errors],
+                         [3, [128, 64, 32], [0, 0, 0]])
+        self.assertIs(c.perimeter_pyramid(sample_rate=10, levels=3), p)
+        self.assertIs(p[2][5].a, p[0][20].a)
+        self.assertEqual(p.level_for_tolerance(0), 2)
+
+    def test_perimeter_pyramid_refine(self):
+        c = Circuit.from_objects([
+            Straight(Point2D(0, 100), Point2D(300, 200)),
+            BezierTurn(Point2D(300, 200), [Point2D(200, 300)], Point2D(300, 500)),
+            Straight(Point2D(300, 500), Point2D(0, 100))
+        ])
+        p = c.perimeter_pyramid(levels=3)
+        self.assertEqual([p.errors[0], p.errors[1] <= p.errors[2]], [0, True])
+        self.assertEqual(p.level_for_tolerance(p.errors[1]), 1)
+        self.assertEqual([p.refine(2, 5), p.refine(2, 5, 1), p.coarsen(0, 21, 2)],
+                         [range(20, 24), range(10, 12), 5])
+
+    def test_perimeter_pyramid_hairpin(self):
+        # The middle point projects past the end of the chord between its neighbours
+        p = PerimeterPyramid.from_points([Point2D(0, 0), Point2D(200, 0), Point2D(100, 0), Point2D(0, 10)],
+                                         levels=2)
+        self.assertEqual(p.errors, [0, 100])
+
+    def test_perimeter_pyramid_invalidate(self):
+        s = Straight(Point2D(0, 0), Point2D(320, 0))
+        c = Circuit.from_objects([s, Straight(Point2D(320, 0), Point2D(0, 0))])
+        p = c.perimeter_pyramid()
+        s.end = Point2D(640, 0)
+        self.assertIs(c.perimeter_pyramid(), p)
+        c.invalidate_perimeter_pyramids()
+        self.assertIsNot(c.perimeter_pyramid(), p)
+
+    def test_perimeter_pyramid_spacing(self):
+        c = Circuit.from_objects([
+            Straight(Point2D(0, 0), Point2D(150, 0)),
+            Straight(Point2D(150, 0), Point2D(150, 150)),
+            Straight(Point2D(150, 150), Point2D(0, 0))
+        ])
+        p = c.perimeter_pyramid(sample_rate=10, levels=4)
+        self.assertLessEqual(max(s.length() for s in p[0]), 10)
+
+    def test_perimeter_pyramid_scaled_views(self):
+        c = Circuit.from_objects([
+            Straight(Point2D(0, 0), Point2D(320, 0)),
+            Straight(Point2D(320, 0), Point2D(0, 0))
+        ])
+        shared = (c + Vector2D(10, 0)).perimeter_pyramid()
+        for k in range(1, 20):
+            (c * (1 + k / 1000)).perimeter_pyramid()
+        self.assertEqual([len(c._perimeter_pyramids), shared[0][0]],
+                         [1, Segment(Point2D(10, 0), Point2D(20, 0))])
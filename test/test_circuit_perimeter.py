@@ -90,4 +90,28 @@ class TestCircuitPerimeter(TestCase):
             c/2,
             CircuitPerimeter([Segment(Point2D(0, 0), Point2D(150, 0)), Segment(Point2D(150, 0), Point2D(150, 150)),
                               Segment(Point2D(150, 150), Point2D(0, 150)), Segment(Point2D(0, 150), Point2D(0, 0))])
-        )
\ No newline at end of file
+        )
+
+    def test_transform_view(self):
+        c = CircuitPerimeter([
+            Segment(Point2D(0, 0), Point2D(300, 0)),
+            Segment(Point2D(300, 0), Point2D(300, 300)),
+            Segment(Point2D(300, 300), Point2D(0, 300)),
+            Segment(Point2D(0, 300), Point2D(0, 0))
+        ])
+        d = (c + Vector2D(100, 50)) * 2
+        self.assertEqual([d.base is c, d[0]],
+                         [True, Segment(Point2D(200, 100), Point2D(800, 100))])
+        with self.assertRaises(TypeError):
+            d[0] = Segment(Point2D(0, 0), Point2D(1, 1))
+
+    def test_intersects_with(self):
+        c = CircuitPerimeter([
+            Segment(Point2D(0, 0), Point2D(300, 0)),
+            Segment(Point2D(300, 0), Point2D(150, 300)),
+            Segment(Point2D(150, 300), Point2D(0, 0))
+        ])
+        s = Segment(Point2D(350, -50), Point2D(350, 50))
+        d = c + Vector2D(100, 0)
+        self.assertEqual([c.intersects_with(s), d.intersects_with(s)], [False, True])
+        self.assertEqual(d.intersections(s), [Point2D(350, 0)])
@@ -0,0 +1,100 @@
+import io
+import json
+import os
+import subprocess
+import sys
+from contextlib import redirect_stderr
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from circuit_generator.cli import build, main, shard_name, MANIFEST_NAME
+
+
+def read_shards(out):
+    with open(os.path.join(out, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    shards = []
+    for name in sorted(manifest['shards']):
+        with open(os.path.join(out, manifest['shards'][name]['file'])) as f:
+            shards.append(json.load(f))
+    return shards
+
+
+class TestCli(TestCase):
+    def test_build(self):
+        with TemporaryDirectory() as out:
+            manifest = build(5, out, seed=3, shard_size=2, workers=1, log=io.StringIO())
+            self.assertEqual(
+                [sorted(manifest['shards']), [len(s) for s in read_shards(out)]],
+                [[shard_name(0), shard_name(1), shard_name(2)], [2, 2, 1]]
+            )
+
+    def test_build_deterministic(self):
+        with TemporaryDirectory() as a, TemporaryDirectory() as b:
+            build(6, a, seed=7, shard_size=2, workers=1, log=io.StringIO())
+            build(6, b, seed=7, shard_size=2, workers=3, log=io.StringIO())
+            self.assertEqual(read_shards(a), read_shards(b))
+
+    def test_build_resume(self):
+        with TemporaryDirectory() as out:
+            build(4, out, seed=1, shard_size=2, workers=1, log=io.StringIO())
+            expected = read_shards(out)
+            os.remove(os.path.join(out, shard_name(1)))
+            log = io.StringIO()
+            build(4, out, seed=1, shard_size=2, workers=1, log=log)
+            self.assertEqual([read_shards(out), log.getvalue().splitlines()[0]],
+                             [expected, 'Resuming: 1/2 shards already complete'])
+            with self.assertRaises(ValueError):
+                build(4, out, seed=2, shard_size=2, workers=1, log=io.StringIO())
+
+    def test_main_config(self):
+        with TemporaryDirectory() as out:
+            config = os.path.join(out, 'config.json')
+            with open(config, 'w') as f:
+                json.dump({'n_points': [9, 9], 'track_width': 20}, f)
+            self.assertEqual(main(['build', '--count', '1', '--out', os.path.join(out, 'data'), '--workers', '1',
+                                   '--config', config, '--track-width', '25']), 0)
+            with open(os.path.join(out, 'data', MANIFEST_NAME)) as f:
+                generator = json.load(f)['generator']
+            self.assertEqual([generator['n_points'], generator['track_width']], [[9, 9], 25])
+
+    def test_main_invalid_config(self):
+        with TemporaryDirectory() as out:
+            config = os.path.join(out, 'config.json')
+            with open(config, 'w') as f:
+                json.dump({'n_points': [9.5, 12], 'track_width': 'wide'}, f)
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                code = main(['build', '--count', '1', '--out', os.path.join(out, 'data'), '--config', config])
+            self.assertEqual([code, 'n_points must be integer' in stderr.getvalue(),
+                              'track_width must be numeric' in stderr.getvalue()], [2, True, True])
+
+    def test_module_entry_point(self):
+        with TemporaryDirectory() as out:
+            result = subprocess.run([sys.executable, '-m', 'circuit_generator', 'build', '--count', '3',
+                                     '--shard-size', '2', '--workers', '1', '--out', out],
+                                    capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            self.assertEqual([result.returncode, [len(s) for s in read_shards(out)]], [0, [2, 1]])
+
+    def test_main_invalid_ranges(self):
+        with TemporaryDirectory() as out:
+            config = os.path.join(out, 'config.json')
+            with open(config, 'w') as f:
+                json.dump([1, 2], f)
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                codes = [main(['build', '--count', '1', '--out', out, '--config', config]),
+                         main(['build', '--count', '1', '--out', out, '--n-points', '12', '9'])]
+            self.assertEqual([codes, 'n_points has minimum 12 above maximum 9' in stderr.getvalue()],
+                             [[2, 2], True])
+
+    def test_file_permissions(self):
+        with TemporaryDirectory() as out:
+            umask = os.umask(0o022)
+            try:
+                build(1, out, shard_size=1, workers=1, log=io.StringIO())
+            finally:
+                os.umask(umask)
+            self.assertEqual([os.stat(os.path.join(out, name)).st_mode & 0o777
+                              for name in (MANIFEST_NAME, shard_name(0))], [0o644, 0o644])
@@ -0,0 +1,31 @@
+import random
+from itertools import islice
+from unittest import TestCase
+
+from circuit_generator.circuit import Circuit
+from circuit_generator.generator import CircuitGenerator
+
+
+class TestCircuitGenerator(TestCase):
+    def test_iter_layouts(self):
+        g = CircuitGenerator()
+        layouts = list(g.iter_layouts(seed=0, limit=5))
+        self.assertEqual([len(layouts), type(layouts[0]), g._last_layout], [5, Circuit, None])
+
+    def test_iter_layouts_unbounded(self):
+        layouts = list(islice(CircuitGenerator().iter_layouts(seed=0), 3))
+        self.assertEqual(len(layouts), 3)
+
+    def test_iter_layouts_deterministic(self):
+        g = CircuitGenerator()
+        serial = [c.to_dicts() for c in g.iter_layouts(seed=4, limit=6)]
+        offset = [c.to_dicts() for c in g.iter_layouts(seed=4, limit=3, start=3)]
+        prefetched = [c.to_dicts() for c in g.iter_layouts(seed=4, limit=6, prefetch=2, workers=2)]
+        self.assertEqual([offset, prefetched], [serial[3:], serial])
+
+    def test_iter_layouts_keeps_random_state(self):
+        random.seed(1)
+        expected = random.random()
+        random.seed(1)
+        list(CircuitGenerator().iter_layouts(seed=0, limit=2))
+        self.assertEqual(random.random(), expected)
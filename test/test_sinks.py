@@ -0,0 +1,65 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from datatypes.geometry import Point2D
+
+from circuit_generator.circuit import Circuit
+from circuit_generator.generator import CircuitGenerator
+from circuit_generator.sections import Straight, BezierTurn
+from circuit_generator.sinks import JsonLinesSink, ShardSink, read_shard
+
+
+class TestSinks(TestCase):
+    def test_json_lines_sink(self):
+        layouts = list(CircuitGenerator().iter_layouts(seed=0, limit=5))
+        with TemporaryDirectory() as out:
+            path = os.path.join(out, 'layouts.jsonl')
+            with JsonLinesSink(path, flush_every=2) as sink:
+                self.assertEqual(sink.write_all(layouts), 5)
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(lines, [json.loads(json.dumps(c.to_dicts(), default=float)) for c in layouts])
+
+    def test_shard_sink(self):
+        c = Circuit.from_objects([
+            Straight(Point2D(0, 100), Point2D(300, 200)),
+            BezierTurn(Point2D(300, 200), [Point2D(200, 300)], Point2D(300, 500)),
+            BezierTurn(Point2D(300, 500), [Point2D(200, 300), Point2D(100, 200)], Point2D(0, 100))
+        ])
+        with TemporaryDirectory() as out:
+            with ShardSink(out, shard_size=2) as sink:
+                sink.write_all([c] * 5)
+            self.assertEqual(sorted(os.listdir(out)), ['shard-00000.npz', 'shard-00001.npz', 'shard-00002.npz'])
+            circuits = [x for shard in sink.shards for x in read_shard(shard)]
+        self.assertEqual([len(circuits)] + [x._section_list for x in circuits],
+                         [5] + [c._section_list] * 5)
+
+    def test_shard_sink_error(self):
+        layouts = list(CircuitGenerator().iter_layouts(seed=0, limit=3))
+        with TemporaryDirectory() as out:
+            with self.assertRaises(RuntimeError):
+                with ShardSink(out, shard_size=2) as sink:
+                    sink.write_all(layouts)
+                    raise RuntimeError
+            self.assertEqual(sorted(os.listdir(out)), ['shard-00000.npz'])
+
+    def test_shard_sink_numbering(self):
+        layouts = list(CircuitGenerator().iter_layouts(seed=0, limit=2))
+        with TemporaryDirectory() as out:
+            for _ in range(2):
+                with ShardSink(out, shard_size=2) as sink:
+                    sink.write_all(layouts)
+            self.assertEqual(sorted(os.listdir(out)), ['shard-00000.npz', 'shard-00001.npz'])
+
+    def test_shard_sink_permissions(self):
+        layouts = list(CircuitGenerator().iter_layouts(seed=0, limit=1))
+        with TemporaryDirectory() as out:
+            umask = os.umask(0o022)
+            try:
+                with ShardSink(out, shard_size=1) as sink:
+                    sink.write_all(layouts)
+            finally:
+                os.umask(umask)
+            self.assertEqual(os.stat(sink.shards[0]).st_mode & 0o777, 0o644)